@@ -5,16 +5,37 @@ This module provides functionality to retrieve, add, delete, and update
 movies in the database. Each movie is stored with a title, year, and
 rating attribute. The SQLite database is created and managed via SQLAlchemy.
 """
-from sqlalchemy import create_engine, text
+import statistics
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import QueuePool
 
 # Define the database URL
 DB_URL = "sqlite:///movies.db"
 
-# Create the engine
-engine = create_engine(DB_URL, echo=False)
+# Create the engine with a connection pool so the menu loop reuses
+# warm connections instead of reopening the database file on every call
+engine = create_engine(DB_URL,
+                       echo=False,
+                       poolclass=QueuePool,
+                       pool_size=5,
+                       pool_pre_ping=False,
+                       connect_args={"check_same_thread": False})
+
+
+@event.listens_for(engine, "connect")
+def _tune_sqlite_connection(dbapi_connection, connection_record):
+    """Apply SQLite performance pragmas to every pooled connection."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-64000")
+    cursor.close()
+
 
 # Create the movies table if it does not exist
-with engine.connect() as connection:
+with engine.begin() as connection:
     connection.execute(text("""
                             CREATE TABLE IF NOT EXISTS movies
                             (
@@ -25,59 +46,266 @@ with engine.connect() as connection:
                                 poster_image_url TEXT NOT NULL
                             )
                             """))
-    connection.commit()
+    connection.execute(text("CREATE INDEX IF NOT EXISTS idx_rating ON movies(rating)"))
+    connection.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS idx_title ON movies(title)"))
+
+    # Full-text index over the titles, kept in sync with triggers so
+    # keyword search runs on FTS5 posting lists instead of table scans
+    _fts_is_new = connection.execute(text("""SELECT COUNT(*)
+                                             FROM sqlite_master
+                                             WHERE type = 'table'
+                                               AND name = 'movies_fts'""")).scalar() == 0
+    connection.execute(text("""
+                            CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts
+                            USING fts5(title, content='movies', content_rowid='id')
+                            """))
+    connection.execute(text("""
+                            CREATE TRIGGER IF NOT EXISTS movies_fts_insert
+                            AFTER INSERT ON movies BEGIN
+                                INSERT INTO movies_fts(rowid, title)
+                                VALUES (new.id, new.title);
+                            END
+                            """))
+    connection.execute(text("""
+                            CREATE TRIGGER IF NOT EXISTS movies_fts_delete
+                            AFTER DELETE ON movies BEGIN
+                                INSERT INTO movies_fts(movies_fts, rowid, title)
+                                VALUES ('delete', old.id, old.title);
+                            END
+                            """))
+    connection.execute(text("""
+                            CREATE TRIGGER IF NOT EXISTS movies_fts_update
+                            AFTER UPDATE OF title ON movies BEGIN
+                                INSERT INTO movies_fts(movies_fts, rowid, title)
+                                VALUES ('delete', old.id, old.title);
+                                INSERT INTO movies_fts(rowid, title)
+                                VALUES (new.id, new.title);
+                            END
+                            """))
+    if _fts_is_new:
+        connection.execute(text("INSERT INTO movies_fts(movies_fts) VALUES ('rebuild')"))
+
+
+# Statements used on every call, parsed into TextClauses once at import
+_Q_LIST = text("""SELECT title, year, rating, poster_image_url
+                  FROM movies""")
+_Q_AGGREGATES = text("""SELECT COUNT(*), AVG(rating), MIN(rating), MAX(rating)
+                        FROM movies""")
+_Q_MEDIAN = text("""SELECT rating
+                    FROM movies
+                    ORDER BY rating
+                    LIMIT :limit OFFSET :offset""")
+_Q_EXTREMES = text("""SELECT title, year, rating
+                      FROM movies
+                      WHERE rating IN (:minimum, :maximum)""")
+_Q_SORTED = text("""SELECT title, year, rating
+                    FROM movies
+                    ORDER BY rating DESC""")
+_Q_BUCKETS = text("""SELECT CAST(rating AS INTEGER) AS bucket, COUNT(*)
+                     FROM movies
+                     GROUP BY bucket
+                     ORDER BY bucket""")
+_Q_SEARCH_FTS = text("""SELECT movies.title, movies.year, movies.rating
+                        FROM movies_fts
+                        JOIN movies ON movies.id = movies_fts.rowid
+                        WHERE movies_fts MATCH :query""")
+_Q_INSERT = text("""INSERT INTO movies (title, year, rating, poster_image_url)
+                    VALUES (:title, :year, :rating, :image)
+                    ON CONFLICT(title) DO NOTHING""")
+_Q_DELETE = text("""DELETE
+                    FROM movies
+                    WHERE title = :title""")
+_Q_UPDATE = text("""UPDATE movies
+                    SET rating = :rating
+                    WHERE title = :title""")
+
+# In-memory cache of the movies table, kept in sync by the mutating
+# functions so read-only callers skip the SQL round trip entirely
+_MOVIES_CACHE = None
+
+# Titles as a tuple for O(1) random access, dropped whenever the set of
+# titles changes
+_TITLES_TUPLE = None
 
 
 def list_movies():
     """Retrieve all movies from the database."""
-    with engine.connect() as connection:
-        result = connection.execute(text("""SELECT
-                                                title,
-                                                year,
-                                                rating,
-                                                poster_image_url
-                                            FROM movies"""))
-        movies = result.fetchall()
+    global _MOVIES_CACHE
+
+    if _MOVIES_CACHE is None:
+        with engine.begin() as connection:
+            result = connection.execute(_Q_LIST)
+            # Stream rows straight into the dict instead of
+            # materializing an intermediate fetchall() list
+            _MOVIES_CACHE = {row["title"]: {"year": row["year"],
+                                            "rating": row["rating"],
+                                            "image": row["poster_image_url"]}
+                             for row in result.mappings()}
+
+    return _MOVIES_CACHE
+
+
+def get_titles():
+    """Return all movie titles as a tuple supporting O(1) indexing."""
+    global _TITLES_TUPLE
+
+    if _TITLES_TUPLE is None:
+        _TITLES_TUPLE = tuple(list_movies())
+
+    return _TITLES_TUPLE
 
-    return {row[0]: {"year": row[1], "rating": row[2], "image": row[3]} for row in movies}
+
+def get_stats():
+    """Compute rating statistics directly in SQL.
+
+    Returns a dict with the average and median rating plus the lists of
+    best and worst movies as (title, year, rating) rows.
+    """
+    with engine.begin() as connection:
+        count, average, minimum, maximum = connection.execute(_Q_AGGREGATES).one()
+
+        # Median via the rating index: grab the middle row (or the two
+        # middle rows for an even count) instead of sorting in Python
+        middle = connection.execute(
+            _Q_MEDIAN,
+            {"limit": 2 - count % 2, "offset": (count - 1) // 2}).scalars().all()
+        median = statistics.median(middle) if middle else None
+
+        extremes = connection.execute(
+            _Q_EXTREMES,
+            {"minimum": minimum, "maximum": maximum}).fetchall()
+
+    # Split the extremes into best and worst in a single pass
+    best = []
+    worst = []
+    for row in extremes:
+        if row[2] == maximum:
+            best.append(row)
+        if row[2] == minimum:
+            worst.append(row)
+
+    return {"average": average, "median": median, "best": best, "worst": worst}
+
+
+def get_movies_sorted():
+    """Retrieve all movies sorted by rating, highest first."""
+    with engine.begin() as connection:
+        return connection.execute(_Q_SORTED).fetchall()
+
+
+def get_rating_buckets():
+    """Count movies per whole-number rating bucket, grouped in SQL."""
+    with engine.begin() as connection:
+        return connection.execute(_Q_BUCKETS).fetchall()
+
+
+def search_titles_fts(query):
+    """Keyword/prefix search for movies via the FTS5 title index.
+
+    The query is quoted as a phrase with a trailing prefix wildcard so
+    arbitrary user input cannot break FTS5's match syntax.
+    """
+    pattern = '"' + query.replace('"', '') + '"*'
+    with engine.begin() as connection:
+        return connection.execute(_Q_SEARCH_FTS, {"query": pattern}).fetchall()
 
 
 def add_movie(title, year, rating, image):
-    """Add a new movie to the database."""
-    with engine.connect() as connection:
+    """Add a new movie to the database.
+
+    Uses an UPSERT so the existence check and the insert are one round
+    trip; returns the number of inserted rows (0 means the title
+    already exists).
+    """
+    global _TITLES_TUPLE
+
+    with engine.begin() as connection:
         try:
-            connection.execute(text("""INSERT INTO movies (title, year, rating, poster_image_url)
-                                       VALUES (:title, :year, :rating, :image)"""),
-                               {"title": title, "year": year, "rating": rating, "image": image})
-            connection.commit()
-            print(f"Movie '{title}' added successfully.")
+            result = connection.execute(
+                _Q_INSERT,
+                {"title": title, "year": year, "rating": rating, "image": image})
+            if result.rowcount:
+                if _MOVIES_CACHE is not None:
+                    _MOVIES_CACHE[title] = {"year": year, "rating": rating, "image": image}
+                _TITLES_TUPLE = None
+                print(f"Movie '{title}' added successfully.")
+            return result.rowcount
         except Exception as e:
             print(f"Error: {e}")
+            return 0
+
+
+def add_movies(rows):
+    """Add many movies to the database inside a single transaction.
+
+    Each row is a dict with "title", "year", "rating" and "image" keys.
+    Rows are chunked so very large batches stay under SQLite's
+    bound-parameter limit, while still paying only one commit. Titles
+    that already exist are skipped via the UPSERT, so one duplicate
+    cannot abort the rest of the batch.
+    """
+    global _TITLES_TUPLE
+
+    chunk_size = 500
+    try:
+        with engine.begin() as connection:
+            inserted = 0
+            for start in range(0, len(rows), chunk_size):
+                inserted += connection.execute(_Q_INSERT,
+                                               rows[start:start + chunk_size]).rowcount
+    except Exception as e:
+        print(f"Error: {e}")
+        return
+
+    if inserted:
+        if _MOVIES_CACHE is not None:
+            # Duplicates were skipped by the UPSERT and keep their
+            # stored values, so only genuinely new titles enter the cache
+            for row in rows:
+                if row["title"] not in _MOVIES_CACHE:
+                    _MOVIES_CACHE[row["title"]] = {"year": row["year"],
+                                                   "rating": row["rating"],
+                                                   "image": row["image"]}
+        _TITLES_TUPLE = None
+    print(f"{inserted} movies added successfully.")
 
 
 def delete_movie(title):
-    """Delete a movie from the database."""
-    with engine.connect() as connection:
+    """Delete a movie from the database.
+
+    Returns the number of deleted rows, so callers can detect a miss
+    without a preceding SELECT.
+    """
+    global _TITLES_TUPLE
+
+    with engine.begin() as connection:
         try:
-            connection.execute(text("""DELETE
-                                       FROM movies
-                                       WHERE title = :title"""),
-                               {"title": title})
-            connection.commit()
-            print(f"Movie '{title}' deleted successfully")
+            result = connection.execute(_Q_DELETE, {"title": title})
+            if result.rowcount:
+                if _MOVIES_CACHE is not None:
+                    _MOVIES_CACHE.pop(title, None)
+                _TITLES_TUPLE = None
+                print(f"Movie '{title}' deleted successfully")
+            return result.rowcount
         except Exception as e:
             print(f"Error: {e}")
+            return 0
 
 
 def update_movie(title, rating):
-    """Update a movie's rating in the database."""
-    with engine.connect() as connection:
+    """Update a movie's rating in the database.
+
+    Returns the number of updated rows, so callers can detect a miss
+    without a preceding SELECT.
+    """
+    with engine.begin() as connection:
         try:
-            connection.execute(text("""UPDATE movies
-                                       SET rating = :rating
-                                       WHERE title = :title"""),
-                               {"title": title, "rating": rating})
-            connection.commit()
-            print(f"Movie '{title}' updated successfully")
+            result = connection.execute(_Q_UPDATE, {"title": title, "rating": rating})
+            if result.rowcount:
+                if _MOVIES_CACHE is not None and title in _MOVIES_CACHE:
+                    _MOVIES_CACHE[title]["rating"] = rating
+                print(f"Movie '{title}' updated successfully")
+            return result.rowcount
         except Exception as e:
             print(f"Error: {e}")
+            return 0
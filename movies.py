@@ -13,19 +13,62 @@ The module provides various functions to interact with the movie database:
 - sorting by ratings
 - producing a histogram of ratings
 """
+import html
 import os
 import random
 import sys
 
-import matplotlib.pyplot as plt
-import requests
-from dotenv import load_dotenv
-from thefuzz import process, fuzz
-
 from movie_storage import movie_storage_sql as storage
 
-load_dotenv()
-API_KEY = os.getenv('API_KEY')
+# Heavy third-party modules (matplotlib, requests, rapidfuzz) are
+# imported inside the functions that need them, so starting the menu
+# does not pay their import cost.
+
+API_KEY = None
+
+
+def _get_api_key():
+    """Load the OMDb API key from the environment on first use."""
+    global API_KEY
+
+    if API_KEY is None:
+        from dotenv import load_dotenv
+        load_dotenv()
+        API_KEY = os.getenv('API_KEY')
+
+    return API_KEY
+
+
+_SESSION = None
+
+
+def _get_session():
+    """Create the shared HTTP session for OMDb calls on first use."""
+    global _SESSION
+
+    if _SESSION is None:
+        import requests
+        _SESSION = requests.Session()
+        _SESSION.mount('https://',
+                       requests.adapters.HTTPAdapter(pool_connections=4,
+                                                     pool_maxsize=16))
+
+    return _SESSION
+
+
+def _fetch_omdb(title):
+    """Fetch one movie from OMDb, returning a storage row dict or None."""
+    import requests
+
+    try:
+        url = f'https://www.omdbapi.com/?apikey={_get_api_key()}&t={title}'
+        data = _get_session().get(url, timeout=10).json()
+        return {"title": data['Title'],
+                "year": int(data['Year']),
+                "rating": float(data['imdbRating']),
+                "image": data['Poster']}
+    except (KeyError, ValueError, requests.exceptions.RequestException):
+        return None
 
 # Colors
 COLORS = {
@@ -48,17 +91,17 @@ def list_movies():
     # Get the data from the SQL database
     movies = storage.list_movies()
 
-    print(f"{len(movies)} in total")
-    for movie in movies:
-        print(f"{movie} ({movies[movie]['year']}): {movies[movie]['rating']}")
+    # Build the listing once and write it in a single call instead of
+    # paying one print (format + flush) per movie
+    lines = [f"{len(movies)} in total"]
+    lines += [f"{title} ({infos['year']}): {infos['rating']}"
+              for title, infos in movies.items()]
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def add_movie():
     """Adds a new movie to the movie database."""
 
-    # Get the data from the SQL database
-    movies = storage.list_movies()
-
     while True:
         title = input(COLORS['warning'] + "Enter new movie name: " + COLORS['endc'])
         if title == "":
@@ -66,46 +109,58 @@ def add_movie():
         else:
             break
 
-    if title not in movies:
+    import requests
 
-        try:
-            url = f'https://www.omdbapi.com/?apikey={API_KEY}&t={title}'
-            res = requests.get(url, timeout=10)
+    try:
+        url = f'https://www.omdbapi.com/?apikey={_get_api_key()}&t={title}'
+        res = _get_session().get(url, timeout=10)
+
+        data = res.json()
 
-            data = res.json()
+        # Add the movie and save the data to the SQL database; the
+        # UPSERT's rowcount tells us whether the title already existed
+        if storage.add_movie(data['Title'],
+                             int(data['Year']),
+                             float(data['imdbRating']),
+                             data['Poster']) == 0:
+            print(COLORS['fail'] + f"Movie {title} already exist!" + COLORS['endc'])
 
-            if data['Title'] not in movies:
+    except KeyError:
+        print(COLORS['fail'] + f"Movie {title} not found" + COLORS['endc'])
+
+    except requests.exceptions.ConnectionError:
+        print(COLORS['fail'] +
+              "Could not connect to the API. Please check your internet connection." +
+              COLORS['endc'])
 
-                # Add the movie and save the data to the SQL database
-                storage.add_movie(data['Title'],
-                                  int(data['Year']),
-                                  float(data['imdbRating']),
-                                  data['Poster'])
+    except requests.exceptions.Timeout:
+        print(COLORS['fail'] + "The request timed out. Please try again." + COLORS['endc'])
 
-            else:
-                print(COLORS['fail'] + f"Movie {title} already exist!" + COLORS['endc'])
 
-        except KeyError:
-            print(COLORS['fail'] + f"Movie {title} not found" + COLORS['endc'])
+def add_movies_bulk(titles):
+    """Adds many movies at once, fetching the OMDb data in parallel.
+
+    The HTTP requests fan out over a thread pool on the shared session,
+    and every successfully fetched movie lands in the database through
+    one bulk transaction.
+    """
+    from concurrent.futures import ThreadPoolExecutor
 
-        except requests.exceptions.ConnectionError:
-            print(COLORS['fail'] +
-                  "Could not connect to the API. Please check your internet connection." +
-                  COLORS['endc'])
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(_fetch_omdb, titles))
 
-        except requests.exceptions.Timeout:
-            print(COLORS['fail'] + "The request timed out. Please try again." + COLORS['endc'])
+    rows = [row for row in results if row is not None]
+    if rows:
+        storage.add_movies(rows)
 
-    else:
-        print(COLORS['fail'] + f"Movie {title} already exist!" + COLORS['endc'])
+    missed = len(results) - len(rows)
+    if missed:
+        print(COLORS['fail'] + f"{missed} movie(s) could not be fetched" + COLORS['endc'])
 
 
 def delete_movie():
     """Deletes a movie from the movie database."""
 
-    # Get the data from the SQL database
-    movies = storage.list_movies()
-
     while True:
         title = input(COLORS['warning'] + "Enter movie name to delete: " + COLORS['endc'])
         if title == "":
@@ -113,18 +168,14 @@ def delete_movie():
         else:
             break
 
-    if title in movies:
-        storage.delete_movie(title)
-    else:
+    # The DELETE's rowcount tells us whether the movie existed
+    if storage.delete_movie(title) == 0:
         print(COLORS['fail'] + f"Movie {title} doesn't exist!" + COLORS['endc'])
 
 
 def update_movie():
     """Updates a movie from the movies database."""
 
-    # Get the data from the SQL database
-    movies = storage.list_movies()
-
     while True:
         title = input(COLORS['warning'] + "Enter movie name: " + COLORS['endc'])
         if title == "":
@@ -132,72 +183,83 @@ def update_movie():
         else:
             break
 
-    if title in movies:
-
-        while True:
-            try:
-                rating = float(input(COLORS['warning'] +
-                                     "Enter new movie rating (0-10): "
-                                     + COLORS['endc']))
-                if 0 <= rating <= 10:
-                    movies[title]['rating'] = rating
-                    break
-                print(COLORS['fail'] + "Please enter a valid number." + COLORS['endc'])
-            except ValueError:
-                print(COLORS['fail'] + "Please enter a valid number." + COLORS['endc'])
-
-        # Update the movie in the SQL database
-        storage.update_movie(title, rating)
-
-    else:
+    while True:
+        try:
+            rating = float(input(COLORS['warning'] +
+                                 "Enter new movie rating (0-10): "
+                                 + COLORS['endc']))
+            if 0 <= rating <= 10:
+                break
+            print(COLORS['fail'] + "Please enter a valid number." + COLORS['endc'])
+        except ValueError:
+            print(COLORS['fail'] + "Please enter a valid number." + COLORS['endc'])
+
+    # The UPDATE's rowcount tells us whether the movie existed
+    if storage.update_movie(title, rating) == 0:
         print(COLORS['fail'] + f"Movie {title} not found" + COLORS['endc'])
 
 
 def stats():
     """Shows statistics about the movies database."""
 
+    # Let SQLite compute the aggregates instead of scanning in Python
+    movie_stats = storage.get_stats()
+
+    print(f"Average rating: {round(movie_stats['average'], 1)}")
+    print(f"Median rating: {movie_stats['median']}")
+
+    for title, year, rating in movie_stats['best']:
+        print(f"Best movie: {title} ({year}), {rating}")
+    for title, year, rating in movie_stats['worst']:
+        print(f"Worst movie: {title} ({year}), {rating}")
+
+
+def random_movie():
+    """Gives a random movie from the movie database."""
+
     # Get the data from the SQL database
     movies = storage.list_movies()
 
-    ratings = [movies[movie]["rating"] for movie in movies]
+    # O(1) pick from the cached titles tuple instead of copying items()
+    titles = storage.get_titles()
+    movie = titles[random.randrange(len(titles))]
+    print(f"Your movie for tonight: {movie}, it's rated {movies[movie]['rating']}")
 
-    # Average
-    average = sum(ratings) / len(ratings)
-    print(f"Average rating: {round(average, 1)}")
 
-    # Median
-    sorted_ratings = sorted(ratings)
-    mid = int(len(sorted_ratings) / 2)
+# Titles normalized once for fuzzy matching, rebuilt only when titles change
+_PROCESSED_TITLES = {}
 
-    if len(sorted_ratings) % 2 != 0:
-        median = sorted_ratings[mid]
-    else:
-        median = (sorted_ratings[mid - 1] + sorted_ratings[mid]) / 2
+# (lowered, original) title pairs for the substring pass, rebuilt only
+# when the set of titles changes; a list keeps titles that differ only
+# in case, which a dict keyed on the lowered form would collapse
+_LOWER_TITLES = []
+_LOWER_TITLES_KEYS = None
 
-    print(f"Median rating: {median}")
 
-    # Best and worst movie
-    maximum = max(ratings)
-    minimum = min(ratings)
-    for movie in movies:
-        if movies[movie]["rating"] == maximum:
-            print(f"Best movie: {movie} ({movies[movie]["year"]}), {movies[movie]["rating"]}")
-        if movies[movie]["rating"] == minimum:
-            print(f"Worst movie: {movie} ({movies[movie]["year"]}), {movies[movie]["rating"]}")
+def _get_lower_titles(movies):
+    """Lowercase the movie titles once and reuse them across searches."""
+    global _LOWER_TITLES_KEYS
 
+    if _LOWER_TITLES_KEYS != movies.keys():
+        _LOWER_TITLES[:] = [(movie.lower(), movie) for movie in movies]
+        _LOWER_TITLES_KEYS = set(movies.keys())
 
-def random_movie():
-    """Gives a random movie from the movie database."""
+    return _LOWER_TITLES
 
-    # Get the data from the SQL database
-    movies = storage.list_movies()
 
-    movie, values = random.choice(list(movies.items()))
-    print(f"Your movie for tonight: {movie}, it's rated {values['rating']}")
+def _get_processed_titles(movies):
+    """Normalize the movie titles once and reuse them across fuzzy searches."""
+    from rapidfuzz import utils
+
+    if _PROCESSED_TITLES.keys() != movies.keys():
+        _PROCESSED_TITLES.clear()
+        _PROCESSED_TITLES.update({movie: utils.default_process(movie) for movie in movies})
+    return _PROCESSED_TITLES
 
 
 def search_movie():
     """Search for a movie in the movies database."""
+    from rapidfuzz import process, fuzz, utils
 
     # Get the data from the SQL database
     movies = storage.list_movies()
@@ -209,53 +271,72 @@ def search_movie():
         else:
             break
 
-    movie_is_found = False
-
-    # First search with keyword matching
-    for movie in movies:
-        if title.lower() in movie.lower():
-            print(f"{movie} ({movies[movie]['year']}): {movies[movie]['rating']}")
-            movie_is_found = True
-
-    # Second search with fuzzy string matching
-    if not movie_is_found:
-        fuzzy_search = process.extract(title, movies.keys(), scorer=fuzz.token_set_ratio)
-
-        # Error if the first result has a low score (< 53)
-        if fuzzy_search[0][1] < 53:
+    # First search with keyword matching on the pre-lowercased titles,
+    # so each query lowercases once instead of once per title
+    query = title.lower()
+    matches = [original for lowered, original in _get_lower_titles(movies)
+               if query in lowered]
+    if matches:
+        sys.stdout.write("\n".join(f"{match} ({movies[match]['year']}): "
+                                   f"{movies[match]['rating']}"
+                                   for match in matches) + "\n")
+
+    # Second search with a token/prefix match on the FTS5 index, which
+    # catches word matches the plain substring scan missed
+    fts_hits = []
+    if not matches:
+        fts_hits = storage.search_titles_fts(title)
+        if fts_hits:
+            sys.stdout.write("\n".join(f"{hit_title} ({year}): {rating}"
+                                       for hit_title, year, rating in fts_hits) + "\n")
+
+    # Third search with fuzzy string matching on the pre-normalized titles;
+    # rapidfuzz drops below-threshold candidates internally via score_cutoff
+    if not matches and not fts_hits:
+        fuzzy_search = process.extract(utils.default_process(title),
+                                       _get_processed_titles(movies),
+                                       scorer=fuzz.token_set_ratio,
+                                       processor=None,
+                                       score_cutoff=53,
+                                       limit=10)
+
+        # Error if no result reaches the threshold score (53)
+        if not fuzzy_search:
             print(COLORS['fail'] + f"Movie {title} not found!" + COLORS['endc'])
 
         # Found results with a high score (>= 53)
         else:
-            print(f'The movie "{title}" does not exist. Did you mean:')
-            for fuzzy_movie, score in fuzzy_search:
-                if score >= 53:
-                    print(f"{fuzzy_movie} ({movies[fuzzy_movie]['year']}), "
-                          f"{movies[fuzzy_movie]['rating']}")
+            sys.stdout.write(f'The movie "{title}" does not exist. Did you mean:\n')
+            sys.stdout.write("\n".join(f"{fuzzy_movie} ({movies[fuzzy_movie]['year']}), "
+                                       f"{movies[fuzzy_movie]['rating']}"
+                                       for _processed, _score, fuzzy_movie
+                                       in fuzzy_search) + "\n")
 
 
 def movies_sorted_by_rating():
     """Sort movies by rating."""
 
-    # Get the data from the SQL database
-    movies = storage.list_movies()
+    # Let SQLite sort via the rating index
+    sorted_movies = storage.get_movies_sorted()
 
-    sorted_movies = sorted(movies.items(), key=lambda x: x[1]['rating'], reverse=True)
-    for movie in sorted_movies:
-        print(f"{movie[0]} ({movie[1]['year']}): {movie[1]['rating']}")
+    if sorted_movies:
+        sys.stdout.write("\n".join(f"{title} ({year}): {rating}"
+                                   for title, year, rating in sorted_movies) + "\n")
 
 
 def create_rating_histogram():
     """Creates a histogram of rating values."""
+    import matplotlib
+    matplotlib.use('Agg')  # File output only, skip the interactive backend
+    import matplotlib.pyplot as plt
 
-    # Get the data from the SQL database
-    movies = storage.list_movies()
-
-    # Generate data for the histogram
-    data = [movie["rating"] for movie in movies.values()]
+    # Let SQLite bucket the ratings instead of pulling every row
+    buckets = storage.get_rating_buckets()
 
-    # Plotting a histogram
-    plt.hist(data, color='skyblue', edgecolor='black')
+    # Plotting a histogram from the pre-counted buckets
+    plt.bar([bucket for bucket, _ in buckets],
+            [count for _, count in buckets],
+            color='skyblue', edgecolor='black')
 
     # Adding labels and title
     plt.xlabel('Ratings')
@@ -278,18 +359,16 @@ def exit_database():
 def serialize_movie(title, infos):
     """Serializes a movie object into a string."""
 
-    output = ''
-
-    output += '<li>'
-    output += '<div class="movie">'
-    output += ('<img class="movie-poster"'
-               f'src="{infos["image"]}">')
-    output += f'<div class="movie-title">{title}</div>'
-    output += f'<div class="movie-year">{infos["year"]}</div>'
-    output += '</div>'
-    output += '</li>'
-
-    return output
+    # Join the parts in one go instead of growing a string, and escape
+    # the values so titles with <, > or & don't break the page
+    return ''.join(['<li>',
+                    '<div class="movie">',
+                    '<img class="movie-poster"',
+                    f'src="{html.escape(infos["image"], quote=True)}">',
+                    f'<div class="movie-title">{html.escape(title)}</div>',
+                    f'<div class="movie-year">{infos["year"]}</div>',
+                    '</div>',
+                    '</li>'])
 
 
 def create_movies_html(movies_data):
@@ -297,16 +376,11 @@ def create_movies_html(movies_data):
     Generates HTML markup for a collection of movies.
     """
 
-    output = ""
-
-    if movies_data:
-        for title, infos in movies_data.items():
-            output += serialize_movie(title, infos)
-
-    else:
-        output = "<h2>There is no movie at the moment</h2>"
+    if not movies_data:
+        return "<h2>There is no movie at the moment</h2>"
 
-    return output
+    return "".join(serialize_movie(title, infos)
+                   for title, infos in movies_data.items())
 
 
 def generate_website():
@@ -329,6 +403,22 @@ def generate_website():
     print("Website was generated successfully.")
 
 
+# Menu dispatch table, built once instead of on every loop iteration
+_CHOICES = {
+    "0": exit_database,
+    "1": list_movies,
+    "2": add_movie,
+    "3": delete_movie,
+    "4": update_movie,
+    "5": stats,
+    "6": random_movie,
+    "7": search_movie,
+    "8": movies_sorted_by_rating,
+    "9": create_rating_histogram,
+    "10": generate_website
+}
+
+
 # Main function
 def main():
     """
@@ -355,24 +445,12 @@ def main():
               )
 
         # Select choice
-        choices = {
-            "0": exit_database,
-            "1": list_movies,
-            "2": add_movie,
-            "3": delete_movie,
-            "4": update_movie,
-            "5": stats,
-            "6": random_movie,
-            "7": search_movie,
-            "8": movies_sorted_by_rating,
-            "9": create_rating_histogram,
-            "10": generate_website
-        }
         choice = input(COLORS['warning'] + "Enter your choice (0-10): " + COLORS['endc'])
 
-        if choice in choices:
+        handler = _CHOICES.get(choice)
+        if handler is not None:
             print()  # Linebreak
-            choices[choice]()
+            handler()
             input(COLORS['underline'] + "\nPress enter to continue" + COLORS['endc'])
         else:
             print(COLORS['fail'] + "Invalid choice" + COLORS['endc'])